@@ -20,7 +20,6 @@ import warnings
 import pandas as pd
 import fds.sdk.FactSetFundamentals
 from fds.sdk.FactSetFundamentals.api import metrics_api, fact_set_fundamentals_api
-from fds.sdk.FactSetFundamentals.models import *
 from fds.sdk.FactSetFundamentals.model.ids_batch_max30000 import IdsBatchMax30000
 from fds.sdk.FactSetFundamentals.model.metrics import Metrics
 from fds.sdk.FactSetFundamentals.model.periodicity import Periodicity
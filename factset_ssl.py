@@ -0,0 +1,48 @@
+"""
+FactSet SSL Certificate Helpers
+Shared handling of the proxy CA certificate the FactSet scripts download from the NAS.
+The cert is kept under a content-addressed name in a private per-user directory.
+"""
+
+import getpass
+import hashlib
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+CERT_CACHE_DIR = Path(tempfile.gettempdir()) / f"factset_certs_{getpass.getuser()}"  # Private (0700) per user
+
+def private_cert_dir() -> Path:
+    """Create (or reuse) the per-user cert directory, refusing one another user could write to."""
+    CERT_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        st = os.lstat(CERT_CACHE_DIR)
+        if stat.S_ISLNK(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise PermissionError(f"{CERT_CACHE_DIR} is not a private directory owned by this user")
+    return CERT_CACHE_DIR
+
+def install_certificate(cert_data: bytes) -> Path:
+    """Store the cert in the private directory and point requests/ssl at it.
+
+    Repeated runs and parallel processes share one file per cert instead of
+    leaking a new one each time. An existing file is only trusted if its
+    contents still match cert_data.
+    """
+    digest = hashlib.sha256(cert_data).hexdigest()[:16]
+    cert_path = private_cert_dir() / f"factset_cert_{digest}.cer"
+
+    try:
+        current = cert_path.read_bytes()
+    except OSError:
+        current = None
+    if current != cert_data:
+        # Write to a private temp file first so readers never see a partial cert
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cert_path.parent)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(cert_data)
+        os.replace(tmp_path, cert_path)
+
+    os.environ["REQUESTS_CA_BUNDLE"] = str(cert_path)
+    os.environ["SSL_CERT_FILE"] = str(cert_path)
+    return cert_path
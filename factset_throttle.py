@@ -0,0 +1,57 @@
+"""
+FactSet Request Throttling
+Shared rate limiting and retry helpers for the FactSet scripts.
+Each script creates its own TokenBucket and passes in its retry settings.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from fds.sdk.FactSetFundamentals.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() only waits once the request rate cap is hit."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping only as long as needed for the bucket to refill."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def call_with_retry(api_call: Callable, *args, rate_limiter: TokenBucket, max_retries: int,
+                    base_delay: float, max_delay: float, **kwargs) -> Any:
+    """Call a rate-limited FactSet endpoint, backing off with jitter only on 429/5xx responses.
+    
+    Scripts bind their own limiter and retry settings with functools.partial.
+    """
+    for attempt in range(max_retries):
+        rate_limiter.acquire()
+        try:
+            return api_call(*args, **kwargs)
+        except ApiException as e:
+            retryable = e.status == 429 or (e.status is not None and 500 <= e.status < 600)
+            if not retryable or attempt == max_retries - 1:
+                raise
+            delay = min(base_delay * (2 ** attempt), max_delay)
+            delay += random.uniform(0, delay)
+            logger.warning(f"⏳ API returned {e.status}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
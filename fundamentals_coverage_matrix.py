@@ -9,18 +9,25 @@ Outputs to Excel with detailed analysis.
 import os
 import sys
 import json
+import argparse
 import time
 import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from urllib.parse import quote
 from typing import Dict, List, Optional, Any, Tuple
 import warnings
 
+import numpy as np
 import pandas as pd
 import yaml
 import fds.sdk.FactSetFundamentals
 from fds.sdk.FactSetFundamentals.api import metrics_api, fact_set_fundamentals_api
-from fds.sdk.FactSetFundamentals.models import *
 from fds.sdk.FactSetFundamentals.model.ids_batch_max30000 import IdsBatchMax30000
 from fds.sdk.FactSetFundamentals.model.metrics import Metrics
 from fds.sdk.FactSetFundamentals.model.periodicity import Periodicity
@@ -30,9 +37,8 @@ from fds.sdk.FactSetFundamentals.model.batch import Batch
 from fds.sdk.FactSetFundamentals.model.fundamental_request_body import FundamentalRequestBody
 from fds.sdk.FactSetFundamentals.model.fundamentals_request import FundamentalsRequest
 from dotenv import load_dotenv
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+
+from factset_throttle import TokenBucket
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
@@ -57,6 +63,44 @@ TARGET_FISCAL_QUARTER = 1
 TARGET_DATE_START = "2025-01-01"
 TARGET_DATE_END = "2025-03-31"
 
+# Category labels for the Yes/No analysis columns (code 0 = No, 1 = Yes)
+YES_NO = ['No', 'Yes']
+
+# Currency and update type of every fundamentals request; both are part of the response cache key
+REQUEST_CURRENCY = "CAD"  # Standardize to CAD for comparison
+REQUEST_UPDATE_TYPE = "RP"
+
+# Constant request pieces shared by every fundamentals call (read-only once built)
+_PERIODICITY_QTR = Periodicity("QTR")
+_UPDATE_TYPE_RP = UpdateType(REQUEST_UPDATE_TYPE)
+_BATCH_N = Batch("N")
+
+# Required fields of each Fundamental in a response, fetched in one call
+_metric_and_value = attrgetter('metric', 'value')
+
+# Maximum number of FactSet requests in flight at once
+CONCURRENCY_LIMIT = int(os.getenv('FACTSET_CONCURRENCY', '8'))
+
+# Maximum FactSet requests per second across all worker threads
+RATE_LIMIT = float(os.getenv('FACTSET_RATE_LIMIT', '10'))
+
+# Local cache for the metrics catalog (Phase 1)
+METRICS_CACHE_PATH = ".cache/metrics.json"
+METRICS_CACHE_TTL_DAYS = 7
+
+# Local cache of per-(bank, metric, period) API responses (Phase 2)
+RESPONSE_CACHE_PATH = ".cache/responses.sqlite"
+RESPONSE_CACHE_VERSION = 2  # Bump when the table layout changes; older caches are dropped
+RESPONSE_CACHE_EMPTY_TTL_DAYS = 1  # "No data" answers are re-requested after this, values are kept
+
+# Request settings a cached response was fetched with
+_RESPONSE_CACHE_SETTINGS = f"{REQUEST_CURRENCY}/{REQUEST_UPDATE_TYPE}"
+
+# sqlite3 connections are shared across worker threads, so serialize access
+_response_cache_lock = threading.Lock()
+
+_rate_limiter = TokenBucket(RATE_LIMIT)
+
 def validate_env_vars():
     """Validate required environment variables."""
     required_vars = [
@@ -157,8 +201,70 @@ def get_canadian_and_us_banks(config: Dict[str, Any]) -> Dict[str, Dict[str, str
     logger.info(f"📊 Found {len(canadian_us_banks)} Canadian and US banks to analyze")
     return canadian_us_banks
 
-def get_all_available_metrics(api_client) -> Dict[str, List[Dict[str, Any]]]:
-    """Fetch all available metrics from the API grouped by category."""
+def load_metrics_cache(
+    path: str = METRICS_CACHE_PATH,
+    ttl_days: int = METRICS_CACHE_TTL_DAYS
+) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """Load the cached metrics catalog if it exists and is younger than the TTL."""
+    if not os.path.exists(path):
+        return None
+    
+    age_seconds = time.time() - os.path.getmtime(path)
+    if age_seconds >= ttl_days * 86400:
+        logger.info(f"⌛ Metrics cache is older than {ttl_days} days - refreshing")
+        return None
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Could not read metrics cache {path}: {str(e)}")
+        return None
+
+def save_metrics_cache(all_metrics: Dict[str, List[Dict[str, Any]]], path: str = METRICS_CACHE_PATH):
+    """Save the metrics catalog to the local cache."""
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(all_metrics, f)
+        logger.info(f"💾 Metrics catalog cached to {path}")
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write metrics cache {path}: {str(e)}")
+
+def fetch_category_metrics(data_api, category: str) -> List[Dict[str, Any]]:
+    """Fetch the metric definitions for a single category."""
+    logger.info(f"  📂 Fetching {category} metrics...")
+    
+    # API call to get metrics for category
+    _rate_limiter.acquire()
+    response = data_api.get_fds_fundamentals_metrics(category=category)
+    
+    metrics_list = []
+    if response and hasattr(response, 'data') and response.data:
+        for metric in response.data:
+            metric_dict = {
+                'metric': metric.metric if hasattr(metric, 'metric') else None,
+                'description': metric.description if hasattr(metric, 'description') else None,
+                'data_type': metric.data_type if hasattr(metric, 'data_type') else None,
+                'category': category
+            }
+            if metric_dict['metric']:  # Only add if metric code exists
+                metrics_list.append(metric_dict)
+    
+    return metrics_list
+
+def get_all_available_metrics(api_client, refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch all available metrics from the API grouped by category.
+    
+    The catalog is served from the local cache when it is fresh, unless refresh is set.
+    """
+    if not refresh:
+        cached_metrics = load_metrics_cache()
+        if cached_metrics is not None:
+            total_metrics = sum(len(metrics) for metrics in cached_metrics.values())
+            logger.info(f"✅ Loaded {total_metrics} metrics from cache: {METRICS_CACHE_PATH}")
+            return cached_metrics
+    
     logger.info("🔍 Fetching all available metrics from FactSet Fundamentals API...")
     
     data_api = metrics_api.MetricsApi(api_client)
@@ -177,225 +283,428 @@ def get_all_available_metrics(api_client) -> Dict[str, List[Dict[str, Any]]]:
         "DATES"
     ]
     
-    all_metrics = {}
+    # Pre-seed in category order so the catalog layout doesn't depend on completion order
+    all_metrics = {category: [] for category in categories}
     total_metrics = 0
+    had_errors = False
     
-    for category in categories:
-        try:
-            logger.info(f"  📂 Fetching {category} metrics...")
-            
-            # API call to get metrics for category
-            response = data_api.get_fds_fundamentals_metrics(category=category)
+    with ThreadPoolExecutor(max_workers=min(len(categories), CONCURRENCY_LIMIT)) as executor:
+        futures = {
+            executor.submit(fetch_category_metrics, data_api, category): category
+            for category in categories
+        }
+        
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                metrics_list = future.result()
+            except Exception as e:
+                logger.error(f"    ❌ Error fetching {category}: {str(e)}")
+                had_errors = True
+                continue
             
-            if response and hasattr(response, 'data') and response.data:
-                metrics_list = []
-                for metric in response.data:
-                    metric_dict = {
-                        'metric': metric.metric if hasattr(metric, 'metric') else None,
-                        'description': metric.description if hasattr(metric, 'description') else None,
-                        'data_type': metric.data_type if hasattr(metric, 'data_type') else None,
-                        'category': category
-                    }
-                    if metric_dict['metric']:  # Only add if metric code exists
-                        metrics_list.append(metric_dict)
-                
+            if metrics_list:
                 all_metrics[category] = metrics_list
                 count = len(metrics_list)
                 total_metrics += count
                 logger.info(f"    ✅ Found {count} metrics in {category}")
             else:
-                all_metrics[category] = []
                 logger.warning(f"    ⚠️ No metrics found for {category}")
-            
-            time.sleep(0.5)  # Rate limiting
-            
-        except Exception as e:
-            logger.error(f"    ❌ Error fetching {category}: {str(e)}")
-            all_metrics[category] = []
     
     logger.info(f"📊 Total metrics discovered: {total_metrics}")
+    
+    # Only cache a complete catalog so a failed category is retried next run
+    if not had_errors:
+        save_metrics_cache(all_metrics)
+    
     return all_metrics
 
+def open_response_cache(path: str = RESPONSE_CACHE_PATH) -> sqlite3.Connection:
+    """Open (and create if needed) the local response cache database."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != RESPONSE_CACHE_VERSION:
+        conn.execute("DROP TABLE IF EXISTS cache")
+        conn.execute(f"PRAGMA user_version = {RESPONSE_CACHE_VERSION}")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache ("
+        "ticker TEXT, metric TEXT, fy INT, fq INT, settings TEXT, value TEXT, fetched_at INT, "
+        "PRIMARY KEY (ticker, metric, fy, fq, settings))"
+    )
+    conn.commit()
+    logger.info(f"✅ Using response cache: {path}")
+    return conn
+
+def load_cached_values(
+    cache: sqlite3.Connection,
+    bank_ticker: str,
+    metrics_batch: List[str],
+    fiscal_year: int,
+    fiscal_quarter: int
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Return cached metric values for a bank and the metrics not yet in the cache.
+    
+    Metrics cached with a NULL value were fetched before and returned no data;
+    those entries count as missing once they are older than RESPONSE_CACHE_EMPTY_TTL_DAYS.
+    """
+    placeholders = ','.join('?' * len(metrics_batch))
+    empty_cutoff = int(time.time()) - RESPONSE_CACHE_EMPTY_TTL_DAYS * 86400
+    with _response_cache_lock:
+        rows = cache.execute(
+            f"SELECT metric, value FROM cache WHERE ticker = ? AND fy = ? AND fq = ? AND settings = ? "
+            f"AND (value IS NOT NULL OR fetched_at >= ?) AND metric IN ({placeholders})",
+            (bank_ticker, fiscal_year, fiscal_quarter, _RESPONSE_CACHE_SETTINGS, empty_cutoff, *metrics_batch)
+        ).fetchall()
+    
+    cached_values = {}
+    cached_metrics = set()
+    for metric, value in rows:
+        cached_metrics.add(metric)
+        if value is not None:
+            cached_values[metric] = json.loads(value)
+    
+    missing_metrics = [metric for metric in metrics_batch if metric not in cached_metrics]
+    return cached_values, missing_metrics
+
+def store_cached_values(
+    cache: sqlite3.Connection,
+    bank_ticker: str,
+    metrics_batch: List[str],
+    metric_values: Dict[str, Any],
+    fiscal_year: int,
+    fiscal_quarter: int
+):
+    """Store fetched metric values, recording metrics without data as NULL."""
+    fetched_at = int(time.time())
+    rows = [
+        (
+            bank_ticker, metric, fiscal_year, fiscal_quarter, _RESPONSE_CACHE_SETTINGS,
+            json.dumps(metric_values[metric], default=str) if metric in metric_values else None,
+            fetched_at
+        )
+        for metric in metrics_batch
+    ]
+    with _response_cache_lock:
+        cache.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        cache.commit()
+
+@lru_cache(maxsize=None)
+def get_q1_fiscal_period(fiscal_year: int) -> FiscalPeriod:
+    """Return the (shared) Q1 fiscal period filter for a fiscal year."""
+    return FiscalPeriod(
+        start=f"{fiscal_year}-01-01",
+        end=f"{fiscal_year}-03-31"
+    )
+
+def fetch_fundamentals(api_client, tickers: List[str], metrics_batch: List[str], fiscal_year: int):
+    """Request Q1 fundamentals for the given tickers and metrics and return the unwrapped response."""
+    fund_api = fact_set_fundamentals_api.FactSetFundamentalsApi(api_client)
+    
+    # Create request; only the ids and metrics vary between calls
+    request_data = FundamentalRequestBody(
+        ids=IdsBatchMax30000(tickers),
+        metrics=Metrics(metrics_batch),
+        periodicity=_PERIODICITY_QTR,
+        fiscal_period=get_q1_fiscal_period(fiscal_year),  # Specific date range for Q1
+        currency=REQUEST_CURRENCY,
+        update_type=_UPDATE_TYPE_RP,
+        batch=_BATCH_N
+    )
+    
+    request = FundamentalsRequest(data=request_data)
+    
+    # Make API call
+    _rate_limiter.acquire()
+    response_wrapper = fund_api.get_fds_fundamentals_for_list(request)
+    
+    # Unwrap response
+    if hasattr(response_wrapper, 'get_response_200'):
+        return response_wrapper.get_response_200()
+    return response_wrapper
+
+def probe_live_metrics(
+    api_client,
+    bank_tickers: Tuple[str, ...],
+    metrics_batch: List[str],
+    fiscal_year: int = TARGET_FISCAL_YEAR,
+    fiscal_quarter: int = TARGET_FISCAL_QUARTER,
+    cache: Optional[sqlite3.Connection] = None
+) -> List[str]:
+    """Return the metrics in a batch worth fetching per bank.
+    
+    One request for all banks at once finds the metrics with data for any bank;
+    the rest are recorded as empty for each bank that has no cache entry for them
+    yet, and skipped unless some bank has them cached. Metrics already cached for
+    every bank are kept without probing.
+    """
+    bank_missing = {}
+    if cache is not None:
+        uncached = set()
+        for bank_ticker in bank_tickers:
+            _, missing_metrics = load_cached_values(
+                cache, bank_ticker, metrics_batch, fiscal_year, fiscal_quarter
+            )
+            bank_missing[bank_ticker] = set(missing_metrics)
+            uncached.update(missing_metrics)
+        if not uncached:
+            return metrics_batch
+    else:
+        uncached = set(metrics_batch)
+    
+    probe_batch = [metric for metric in metrics_batch if metric in uncached]
+    
+    try:
+        response = fetch_fundamentals(api_client, list(bank_tickers), probe_batch, fiscal_year)
+    except Exception as e:
+        # Without a probe result, fall back to fetching every metric per bank
+        logger.debug("Error probing metrics %s..: %s", probe_batch[0], e)
+        return metrics_batch
+    
+    live_metrics = set()
+    if response and hasattr(response, 'data') and response.data:
+        for item in response.data:
+            try:
+                metric, value = _metric_and_value(item)
+            except AttributeError:
+                continue
+            if value is not None:
+                live_metrics.add(metric)
+    
+    dead_metrics = [metric for metric in probe_batch if metric not in live_metrics]
+    if cache is not None and dead_metrics:
+        # Cells a bank already has cached are left alone so a stored value is never replaced by NULL
+        for bank_ticker in bank_tickers:
+            bank_dead = [metric for metric in dead_metrics if metric in bank_missing[bank_ticker]]
+            if bank_dead:
+                store_cached_values(cache, bank_ticker, bank_dead, {}, fiscal_year, fiscal_quarter)
+    
+    # A metric some bank already has cached stays in the batch so that value is still read back
+    dead = {
+        metric for metric in dead_metrics
+        if all(metric in missing_metrics for missing_metrics in bank_missing.values())
+    }
+    return [metric for metric in metrics_batch if metric not in dead]
+
 def get_metric_value_for_bank(
     api_client,
     bank_ticker: str,
     metrics_batch: List[str],
     fiscal_year: int = TARGET_FISCAL_YEAR,
-    fiscal_quarter: int = TARGET_FISCAL_QUARTER
+    fiscal_quarter: int = TARGET_FISCAL_QUARTER,
+    cache: Optional[sqlite3.Connection] = None
 ) -> Dict[str, Any]:
-    """Get metric values for a specific bank for Q1 2025."""
+    """Get metric values for a specific bank for Q1 2025.
     
-    fund_api = fact_set_fundamentals_api.FactSetFundamentalsApi(api_client)
+    When a response cache is given, only metrics missing from it are requested from the API.
+    """
     
-    # Use specific date range for Q1 2025
-    start_date = f"{fiscal_year}-01-01"
-    end_date = f"{fiscal_year}-03-31"
+    cached_values = {}
+    if cache is not None:
+        cached_values, metrics_batch = load_cached_values(
+            cache, bank_ticker, metrics_batch, fiscal_year, fiscal_quarter
+        )
+        if not metrics_batch:
+            return cached_values
     
     try:
-        # Create request
-        ids_instance = IdsBatchMax30000([bank_ticker])
-        metrics_instance = Metrics(metrics_batch)
-        periodicity_instance = Periodicity("QTR")
-        update_type_instance = UpdateType("RP")
-        fiscal_period_instance = FiscalPeriod(
-            start=start_date,
-            end=end_date
-        )
-        batch_instance = Batch("N")
-        
-        request_data = FundamentalRequestBody(
-            ids=ids_instance,
-            metrics=metrics_instance,
-            periodicity=periodicity_instance,
-            fiscal_period=fiscal_period_instance,
-            currency="CAD",  # Standardize to CAD for comparison
-            update_type=update_type_instance,
-            batch=batch_instance
-        )
-        
-        request = FundamentalsRequest(data=request_data)
-        
-        # Make API call
-        response_wrapper = fund_api.get_fds_fundamentals_for_list(request)
-        
-        # Unwrap response
-        if hasattr(response_wrapper, 'get_response_200'):
-            response = response_wrapper.get_response_200()
-        else:
-            response = response_wrapper
+        response = fetch_fundamentals(api_client, [bank_ticker], metrics_batch, fiscal_year)
         
         # Process response
         metric_values = {}
         if response and hasattr(response, 'data') and response.data:
             for item in response.data:
-                if hasattr(item, 'metric') and hasattr(item, 'value'):
-                    # Check if value is not None and fiscal period matches Q1 2025
-                    if item.value is not None:
-                        fiscal_year_match = getattr(item, 'fiscal_year', None) == fiscal_year
-                        fiscal_period_match = getattr(item, 'fiscal_period', None) == fiscal_quarter
-                        
-                        # Store value if it's from Q1 2025 or if no period info (latest available)
-                        if fiscal_year_match and fiscal_period_match:
-                            metric_values[item.metric] = {
-                                'value': item.value,
-                                'fiscal_year': fiscal_year,
-                                'fiscal_period': fiscal_quarter,
-                                'date': getattr(item, 'fiscal_end_date', None)
-                            }
-                        elif item.metric not in metric_values:
-                            # Use latest available if Q1 2025 not found
-                            metric_values[item.metric] = {
-                                'value': item.value,
-                                'fiscal_year': getattr(item, 'fiscal_year', None),
-                                'fiscal_period': getattr(item, 'fiscal_period', None),
-                                'date': getattr(item, 'fiscal_end_date', None)
-                            }
+                try:
+                    metric, value = _metric_and_value(item)
+                except AttributeError:
+                    continue
+                
+                # Check if value is not None and fiscal period matches Q1 2025
+                if value is None:
+                    continue
+                
+                item_fiscal_year = getattr(item, 'fiscal_year', None)
+                item_fiscal_period = getattr(item, 'fiscal_period', None)
+                
+                # Store value if it's from Q1 2025 or if no period info (latest available)
+                if item_fiscal_year == fiscal_year and item_fiscal_period == fiscal_quarter:
+                    metric_values[metric] = {
+                        'value': value,
+                        'fiscal_year': fiscal_year,
+                        'fiscal_period': fiscal_quarter,
+                        'date': getattr(item, 'fiscal_end_date', None)
+                    }
+                elif metric not in metric_values:
+                    # Use latest available if Q1 2025 not found
+                    metric_values[metric] = {
+                        'value': value,
+                        'fiscal_year': item_fiscal_year,
+                        'fiscal_period': item_fiscal_period,
+                        'date': getattr(item, 'fiscal_end_date', None)
+                    }
         
+        if cache is not None:
+            store_cached_values(cache, bank_ticker, metrics_batch, metric_values, fiscal_year, fiscal_quarter)
+        
+        metric_values.update(cached_values)
         return metric_values
         
     except Exception as e:
-        logger.debug(f"Error fetching metrics for {bank_ticker}: {str(e)}")
-        return {}
+        logger.debug("Error fetching metrics for %s: %s", bank_ticker, e)
+        return cached_values
 
 def build_coverage_matrix(
     api_client,
     all_metrics: Dict[str, List[Dict[str, Any]]],
-    banks: Dict[str, Dict[str, str]]
+    banks: Dict[str, Dict[str, str]],
+    response_cache: Optional[sqlite3.Connection] = None
 ) -> pd.DataFrame:
     """Build comprehensive coverage matrix for all banks."""
     
     logger.info("🔨 Building coverage matrix...")
     
     # Prepare data structure
-    rows = []
-    bank_tickers = list(banks.keys())
-    
-    # Process each category and metric
-    for category, metrics in all_metrics.items():
-        if not metrics:
-            continue
-        
-        logger.info(f"\n📊 Processing {category} ({len(metrics)} metrics)")
-        
-        # Group metrics by data type for efficient API calls
-        metrics_by_type = {}
-        metric_info = {}
-        
-        for metric in metrics:
-            metric_code = metric['metric']
-            data_type = metric.get('data_type', 'unknown')
+    bank_tickers = tuple(banks)
+    bank_columns = list(bank_tickers)  # pandas treats a tuple key as a single label
+    n_banks = len(bank_tickers)
+    info_column_names = ['Category', 'Metric Code', 'Description', 'Data Type']
+    category_frames = []
+    
+    with ThreadPoolExecutor(max_workers=CONCURRENCY_LIMIT) as executor:
+        # Process each category and metric
+        for category, metrics in all_metrics.items():
+            if not metrics:
+                continue
             
-            if data_type not in metrics_by_type:
-                metrics_by_type[data_type] = []
-            metrics_by_type[data_type].append(metric_code)
-            metric_info[metric_code] = metric
-        
-        # Process each bank
-        bank_data = {}
-        for bank_ticker in bank_tickers:
-            bank_name = banks[bank_ticker]['name']
-            logger.info(f"  🏦 Checking {bank_ticker} ({bank_name})...")
+            logger.info(f"\n📊 Processing {category} ({len(metrics)} metrics)")
             
-            bank_metrics = {}
+            # Group metrics by data type for efficient API calls
+            metrics_by_type = defaultdict(list)
+            metric_info = {}
             
-            # Test metrics in batches by data type
-            for data_type, metric_codes in metrics_by_type.items():
-                # Process in batches of 20
-                for i in range(0, len(metric_codes), 20):
-                    batch = metric_codes[i:i+20]
-                    
-                    # Get values for this batch
-                    values = get_metric_value_for_bank(api_client, bank_ticker, batch)
-                    bank_metrics.update(values)
-                    
-                    time.sleep(0.3)  # Rate limiting
+            for metric in metrics:
+                metric_code = metric['metric']
+                metrics_by_type[metric.get('data_type', 'unknown')].append(metric_code)
+                metric_info[metric_code] = metric
             
-            bank_data[bank_ticker] = bank_metrics
-            logger.info(f"    ✅ Found data for {len(bank_metrics)} metrics")
-        
-        # Create rows for each metric
-        for metric_code, info in metric_info.items():
-            row = {
-                'Category': category,
-                'Metric Code': metric_code,
-                'Description': info.get('description', ''),
-                'Data Type': info.get('data_type', ''),
-                'Period': f"FY{TARGET_FISCAL_YEAR} Q{TARGET_FISCAL_QUARTER}"
-            }
+            # Probe each batch of 20 for all banks at once to find the metrics with any data
+            probe_futures = [
+                executor.submit(
+                    probe_live_metrics, api_client, bank_tickers, metric_codes[i:i+20],
+                    cache=response_cache
+                )
+                for metric_codes in metrics_by_type.values()
+                for i in range(0, len(metric_codes), 20)
+            ]
+            live_batches = [batch for batch in (future.result() for future in probe_futures) if batch]
             
-            # Add bank values
-            banks_with_data = 0
+            # Fan out one request per (bank, live batch) across the worker pool
+            futures = {}
             for bank_ticker in bank_tickers:
-                if metric_code in bank_data.get(bank_ticker, {}):
-                    value_info = bank_data[bank_ticker][metric_code]
-                    row[bank_ticker] = value_info['value']
-                    banks_with_data += 1
-                else:
-                    row[bank_ticker] = None
+                for batch in live_batches:
+                    future = executor.submit(
+                        get_metric_value_for_bank, api_client, bank_ticker, batch,
+                        cache=response_cache
+                    )
+                    futures[future] = bank_ticker
             
-            # Add analysis columns
-            row['Banks with Data'] = banks_with_data
-            row['Any Bank Has Data'] = 'Yes' if banks_with_data > 0 else 'No'
-            row['All Banks Have Data'] = 'Yes' if banks_with_data == len(bank_tickers) else 'No'
-            row['Coverage %'] = round((banks_with_data / len(bank_tickers)) * 100, 1)
+            # Collect values per bank
+            bank_data = {bank_ticker: {} for bank_ticker in bank_tickers}
+            for future, bank_ticker in futures.items():
+                bank_data[bank_ticker].update(future.result())
             
-            rows.append(row)
-    
-    # Create DataFrame
-    df = pd.DataFrame(rows)
+            # Per-bank detail is debug-only so formatting is skipped on normal runs
+            if logger.isEnabledFor(logging.DEBUG):
+                for bank_ticker in bank_tickers:
+                    logger.debug(
+                        "  🏦 %s (%s): found data for %d metrics",
+                        bank_ticker, banks[bank_ticker]['name'], len(bank_data[bank_ticker])
+                    )
+            
+            # Fill the (metric x bank) value matrix for this category
+            category_codes = list(metric_info)
+            row_index = {metric_code: i for i, metric_code in enumerate(category_codes)}
+            values = np.full((len(category_codes), n_banks), None, dtype=object)
+            for j, bank_ticker in enumerate(bank_tickers):
+                for metric_code, value_info in bank_data[bank_ticker].items():
+                    i = row_index.get(metric_code)
+                    if i is not None:
+                        values[i, j] = value_info['value']
+            
+            # Emit this category as its own frame so the per-bank dicts can be released
+            category_frame = pd.DataFrame({
+                'Category': category,
+                'Metric Code': category_codes,
+                'Description': [metric_info[code].get('description', '') for code in category_codes],
+                'Data Type': [metric_info[code].get('data_type', '') for code in category_codes]
+            })
+            category_frame[bank_columns] = values
+            category_frames.append(category_frame)
+            del bank_data, values
+    
+    # Create DataFrame with a single concatenation of the per-category frames
+    if category_frames:
+        df = pd.concat(category_frames, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=info_column_names + bank_columns)
+    df.insert(len(info_column_names), 'Period', f"FY{TARGET_FISCAL_YEAR} Q{TARGET_FISCAL_QUARTER}")
+    df[bank_columns] = df[bank_columns].infer_objects()
+    values_df = df[bank_columns]
+    
+    # Add analysis columns as whole-column reductions over the bank values
+    banks_with_data = values_df.notna().sum(axis=1)
+    df['Banks with Data'] = banks_with_data
+    counts = banks_with_data.to_numpy()
+    df['Any Bank Has Data'] = pd.Categorical.from_codes((counts > 0).astype(np.int8), categories=YES_NO)
+    df['All Banks Have Data'] = pd.Categorical.from_codes((counts == n_banks).astype(np.int8), categories=YES_NO)
+    df['Coverage %'] = (banks_with_data * (100.0 / n_banks)).round(1)
     
     # Sort by coverage percentage (descending) and category
     df = df.sort_values(['Coverage %', 'Category', 'Metric Code'], ascending=[False, True, True])
     
+    # Use Arrow-backed dtypes, storing the repeated label columns as categoricals
+    df = df.convert_dtypes(dtype_backend='pyarrow')
+    for column in ['Category', 'Data Type', 'Period']:
+        df[column] = df[column].astype('category')
+    
     return df
 
+def save_backup(df: pd.DataFrame, base_filename: str, as_csv: bool = False) -> str:
+    """Save the coverage matrix as a zstd Parquet file (or CSV) and return its path."""
+    if as_csv:
+        filename = f"{base_filename}.csv"
+        df.to_csv(filename, index=False)
+        return filename
+    
+    # Bank value columns can mix dates, strings, numbers and lists, which Arrow
+    # cannot store in one column, so write any object columns as strings
+    object_columns = df.columns[df.dtypes == object]
+    if len(object_columns):
+        df = df.astype({column: 'string[pyarrow]' for column in object_columns})
+    
+    filename = f"{base_filename}.parquet"
+    df.to_parquet(filename, engine='pyarrow', compression='zstd', index=False)
+    return filename
+
+def compute_column_widths(df: pd.DataFrame, max_width: int = 50) -> List[int]:
+    """Compute Excel column widths from the longest rendered value (or header) per column.
+    
+    Missing values are written as blank cells, so they don't count; a column with
+    no values at all (e.g. a bank that returned nothing) is sized by its header.
+    """
+    widths = []
+    for col in df.columns:
+        values = df[col].dropna()
+        longest = values.astype(str).str.len().max() if len(values) else 0
+        widths.append(min(max(int(longest), len(str(col))) + 2, max_width))
+    return widths
+
 def format_excel_output(df: pd.DataFrame, banks: Dict[str, Dict[str, str]], output_path: str):
     """Create formatted Excel file with coverage matrix."""
     
     logger.info(f"📝 Creating Excel output: {output_path}")
     
     # Create Excel writer with xlsxwriter engine for better formatting
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
         
         # Write main data sheet
         df.to_excel(writer, sheet_name='Coverage Matrix', index=False)
@@ -405,97 +714,68 @@ def format_excel_output(df: pd.DataFrame, banks: Dict[str, Dict[str, str]], outp
         worksheet = writer.sheets['Coverage Matrix']
         
         # Define styles
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        header_font = Font(color='FFFFFF', bold=True)
-        
-        bank_header_fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-        analysis_header_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-        
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        base_header = {'border': 1, 'align': 'center', 'valign': 'vcenter', 'bold': True}
+        header_format = workbook.add_format({**base_header, 'bg_color': '#366092', 'font_color': '#FFFFFF'})
+        bank_header_format = workbook.add_format({**base_header, 'bg_color': '#70AD47', 'text_wrap': True})
+        analysis_header_format = workbook.add_format({**base_header, 'bg_color': '#FFC000', 'text_wrap': True})
+        identity_header_format = workbook.add_format({**base_header, 'bg_color': '#366092', 'font_color': '#FFFFFF', 'text_wrap': True})
         
-        # Format headers
-        for col_num, col_name in enumerate(df.columns, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            
-            if col_name in ['Category', 'Metric Code', 'Description', 'Data Type', 'Period']:
-                cell.fill = header_fill
-                cell.font = header_font
-            elif col_name in banks.keys():
-                cell.fill = bank_header_fill
-                cell.font = Font(bold=True)
-            else:  # Analysis columns
-                cell.fill = analysis_header_fill
-                cell.font = Font(bold=True)
+        # Format headers: identity columns, then bank columns, then analysis columns
+        n_identity = 5
+        n_banks = len(banks)
+        headers = list(df.columns)
+        worksheet.write_row(0, 0, headers[:n_identity], identity_header_format)
+        worksheet.write_row(0, n_identity, headers[n_identity:n_identity + n_banks], bank_header_format)
+        worksheet.write_row(0, n_identity + n_banks, headers[n_identity + n_banks:], analysis_header_format)
         
         # Auto-adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+        for col_num, width in enumerate(compute_column_widths(df)):
+            worksheet.set_column(col_num, col_num, width)
         
         # Freeze panes (freeze first row and first 5 columns)
-        worksheet.freeze_panes = 'F2'
+        worksheet.freeze_panes(1, 5)
         
         # Add conditional formatting for coverage percentage
-        from openpyxl.formatting.rule import ColorScaleRule
-        coverage_col = df.columns.get_loc('Coverage %') + 1
-        worksheet.conditional_formatting.add(
-            f'{get_column_letter(coverage_col)}2:{get_column_letter(coverage_col)}{len(df) + 1}',
-            ColorScaleRule(
-                start_type='min', start_color='FF0000',
-                mid_type='percentile', mid_value=50, mid_color='FFFF00',
-                end_type='max', end_color='00FF00'
-            )
+        coverage_col = df.columns.get_loc('Coverage %')
+        worksheet.conditional_format(
+            1, coverage_col, len(df), coverage_col,
+            {
+                'type': '3_color_scale',
+                'min_color': '#FF0000',
+                'mid_type': 'percentile', 'mid_value': 50, 'mid_color': '#FFFF00',
+                'max_color': '#00FF00'
+            }
         )
         
-        # Create summary sheet
-        summary_df = create_summary_sheet(df, banks)
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
-        
-        # Format summary sheet
-        summary_sheet = writer.sheets['Summary']
-        for col_num, col_name in enumerate(summary_df.columns, 1):
-            cell = summary_sheet.cell(row=1, column=col_num)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        # Create summary sheet, writing each section at its own row offset
+        section_format = workbook.add_format({'bold': True})
+        summary_widths = {}
+        start_row = 0
+        for title, section_df in create_summary_sheet(df, banks):
+            section_df.to_excel(writer, sheet_name='Summary', startrow=start_row + 1, index=False)
+            summary_sheet = writer.sheets['Summary']
+            summary_sheet.write(start_row, 0, title, section_format)
+            summary_sheet.write_row(start_row + 1, 0, list(section_df.columns), header_format)
+            
+            for col_num, width in enumerate(compute_column_widths(section_df)):
+                summary_widths[col_num] = max(summary_widths.get(col_num, 0), width)
+            summary_widths[0] = max(summary_widths.get(0, 0), len(title) + 2)
+            
+            # Title row, header row, data rows, then two spacer rows
+            start_row += len(section_df) + 4
         
         # Auto-adjust summary columns
-        for column in summary_sheet.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            summary_sheet.column_dimensions[column_letter].width = adjusted_width
+        for col_num, width in summary_widths.items():
+            summary_sheet.set_column(col_num, col_num, width)
     
     logger.info(f"✅ Excel file created: {output_path}")
 
-def create_summary_sheet(df: pd.DataFrame, banks: Dict[str, Dict[str, str]]) -> pd.DataFrame:
-    """Create summary statistics sheet."""
+def create_summary_sheet(df: pd.DataFrame, banks: Dict[str, Dict[str, str]]) -> List[Tuple[str, pd.DataFrame]]:
+    """Create summary statistics sections as (title, table) pairs."""
     
     bank_cols = list(banks.keys())
+    any_data = df['Any Bank Has Data'] == 'Yes'
+    all_data = df['All Banks Have Data'] == 'Yes'
     
     # Overall statistics
     overall_stats = {
@@ -503,69 +783,72 @@ def create_summary_sheet(df: pd.DataFrame, banks: Dict[str, Dict[str, str]]) ->
                    'Average Coverage %', 'Median Coverage %'],
         'Value': [
             len(df),
-            len(df[df['Any Bank Has Data'] == 'Yes']),
-            len(df[df['All Banks Have Data'] == 'Yes']),
+            int(any_data.sum()),
+            int(all_data.sum()),
             round(df['Coverage %'].mean(), 1),
             round(df['Coverage %'].median(), 1)
         ]
     }
     
-    # Category breakdown
-    category_stats = []
-    for category in df['Category'].unique():
-        cat_df = df[df['Category'] == category]
-        category_stats.append({
-            'Category': category,
-            'Total Metrics': len(cat_df),
-            'With Data': len(cat_df[cat_df['Any Bank Has Data'] == 'Yes']),
-            'Full Coverage': len(cat_df[cat_df['All Banks Have Data'] == 'Yes']),
-            'Avg Coverage %': round(cat_df['Coverage %'].mean(), 1)
-        })
-    
-    # Bank coverage statistics
-    bank_stats = []
-    for bank_ticker in bank_cols:
-        bank_name = banks[bank_ticker]['name']
-        bank_type = banks[bank_ticker]['type']
-        
-        # Count non-null values for this bank
-        bank_coverage = df[bank_ticker].notna().sum()
-        bank_percentage = round((bank_coverage / len(df)) * 100, 1)
-        
-        bank_stats.append({
-            'Bank Ticker': bank_ticker,
-            'Bank Name': bank_name,
-            'Bank Type': bank_type,
-            'Metrics Available': bank_coverage,
-            'Coverage %': bank_percentage
+    # Category breakdown in a single grouped pass
+    category_df = (
+        df.assign(_any=any_data, _all=all_data)
+        .groupby('Category', observed=True, sort=False)
+        .agg(**{
+            'Total Metrics': ('Metric Code', 'size'),
+            'With Data': ('_any', 'sum'),
+            'Full Coverage': ('_all', 'sum'),
+            'Avg Coverage %': ('Coverage %', 'mean')
         })
+        .reset_index()
+    )
+    category_df['Avg Coverage %'] = category_df['Avg Coverage %'].round(1)
+    
+    # Bank coverage statistics (non-null values per bank, counted for all banks at once)
+    bank_coverage = df[bank_cols].notna().sum()
+    bank_df = pd.DataFrame({
+        'Bank Ticker': bank_cols,
+        'Bank Name': [banks[bank_ticker]['name'] for bank_ticker in bank_cols],
+        'Bank Type': [banks[bank_ticker]['type'] for bank_ticker in bank_cols],
+        'Metrics Available': bank_coverage.to_numpy(),
+        'Coverage %': (bank_coverage * (100.0 / len(df))).round(1).to_numpy()
+    })
     
-    # Create summary DataFrames
     overall_df = pd.DataFrame(overall_stats)
-    category_df = pd.DataFrame(category_stats)
-    bank_df = pd.DataFrame(bank_stats)
     
     # Sort bank statistics by coverage
     bank_df = bank_df.sort_values('Coverage %', ascending=False)
     
-    # Combine into single sheet with spacing
-    summary_parts = []
-    summary_parts.append(pd.DataFrame({'Section': ['OVERALL STATISTICS'], 'Value': ['']}))
-    summary_parts.append(overall_df)
-    summary_parts.append(pd.DataFrame({'': ['', '']}))  # Spacer
-    summary_parts.append(pd.DataFrame({'Section': ['CATEGORY BREAKDOWN'], 'Value': ['']}))
-    summary_parts.append(category_df)
-    summary_parts.append(pd.DataFrame({'': ['', '']}))  # Spacer
-    summary_parts.append(pd.DataFrame({'Section': ['BANK COVERAGE'], 'Value': ['']}))
-    summary_parts.append(bank_df)
-    
-    # Concatenate all parts
-    summary_df = pd.concat(summary_parts, ignore_index=True)
-    
-    return summary_df
+    return [
+        ('OVERALL STATISTICS', overall_df),
+        ('CATEGORY BREAKDOWN', category_df),
+        ('BANK COVERAGE', bank_df)
+    ]
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Generate the FactSet Fundamentals coverage matrix")
+    parser.add_argument(
+        '--refresh-metrics',
+        action='store_true',
+        help="Ignore the cached metrics catalog and re-fetch it from FactSet"
+    )
+    parser.add_argument(
+        '--refresh-responses',
+        action='store_true',
+        help="Discard cached bank/metric responses and re-fetch them from FactSet"
+    )
+    parser.add_argument(
+        '--csv',
+        action='store_true',
+        help="Write the data backup as CSV instead of Parquet"
+    )
+    return parser.parse_args()
 
 def main():
     """Main function to generate coverage matrix."""
+    args = parse_args()
+    
     logger.info("="*80)
     logger.info("🏦 FACTSET FUNDAMENTALS COVERAGE MATRIX GENERATOR")
     logger.info("="*80)
@@ -594,28 +877,34 @@ def main():
     # Configure API
     configuration = setup_api_configuration(ssl_cert_path)
     
+    # Open the response cache, discarding it first when a refresh is requested
+    if args.refresh_responses and os.path.exists(RESPONSE_CACHE_PATH):
+        os.remove(RESPONSE_CACHE_PATH)
+        logger.info(f"🗑️ Cleared response cache: {RESPONSE_CACHE_PATH}")
+    response_cache = open_response_cache()
+    
     try:
         with fds.sdk.FactSetFundamentals.ApiClient(configuration) as api_client:
             
             # Phase 1: Get all available metrics
             logger.info("\n📊 PHASE 1: Discovering all available metrics")
             logger.info("-"*60)
-            all_metrics = get_all_available_metrics(api_client)
+            all_metrics = get_all_available_metrics(api_client, refresh=args.refresh_metrics)
             
             # Phase 2: Build coverage matrix
             logger.info("\n📊 PHASE 2: Building coverage matrix for all banks")
             logger.info("-"*60)
             
-            df = build_coverage_matrix(api_client, all_metrics, banks)
+            df = build_coverage_matrix(api_client, all_metrics, banks, response_cache)
             
             # Phase 3: Generate outputs
             logger.info("\n📊 PHASE 3: Generating outputs")
             logger.info("-"*60)
             
-            # Save to CSV (backup)
-            csv_filename = f"coverage_matrix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(csv_filename, index=False)
-            logger.info(f"✅ CSV backup saved: {csv_filename}")
+            # Save data backup (Parquet by default, CSV on request)
+            backup_filename = f"coverage_matrix_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            backup_filename = save_backup(df, backup_filename, as_csv=args.csv)
+            logger.info(f"✅ Data backup saved: {backup_filename}")
             
             # Create formatted Excel
             excel_filename = f"FactSet_Fundamentals_Coverage_Matrix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -651,6 +940,8 @@ def main():
     
     finally:
         # Cleanup
+        response_cache.close()
+        
         if ssl_cert_path and ssl_cert_path.startswith('/tmp/'):
             try:
                 os.unlink(ssl_cert_path)
@@ -0,0 +1 @@
+"""Exploratory FactSet API scripts; run them as modules from the repository root."""
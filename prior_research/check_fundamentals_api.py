@@ -3,9 +3,9 @@
 FactSet Fundamentals API Test Script
 Comprehensive test of all available fundamental data for RY-CA (Royal Bank of Canada).
 Shows ALL categories, metrics, and data points available for business evaluation.
+Run from the repository root: python -m prior_research.check_fundamentals_api
 """
 
-import pandas as pd
 import fds.sdk.FactSetFundamentals
 from fds.sdk.FactSetFundamentals.api import metrics_api, fact_set_fundamentals_api
 from fds.sdk.FactSetFundamentals.models import *
@@ -15,21 +15,36 @@ from fds.sdk.FactSetFundamentals.model.periodicity import Periodicity
 from fds.sdk.FactSetFundamentals.model.update_type import UpdateType
 from fds.sdk.FactSetFundamentals.model.fiscal_period import FiscalPeriod
 from fds.sdk.FactSetFundamentals.model.batch import Batch
+from fds.sdk.FactSetFundamentals.model.fundamental import Fundamental
+from fds.sdk.FactSetFundamentals.model.metric import Metric
 import os
+import logging
+import sys
 from urllib.parse import quote
 from datetime import datetime, timedelta
-import tempfile
 import io
 from smb.SMBConnection import SMBConnection
-from typing import Dict, List, Optional, Set, Tuple, Any
-import warnings
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple, Any
 from dotenv import load_dotenv
 import json
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+from operator import itemgetter
+from collections import defaultdict
 from pathlib import Path
 
-warnings.filterwarnings('ignore', category=pd.errors.SettingWithCopyWarning)
-warnings.filterwarnings('ignore', category=FutureWarning)
+# Shared rate limiting, retry and SSL cert helpers live at the repository root (see the module docstring)
+from factset_throttle import TokenBucket, call_with_retry as throttled_call
+from factset_ssl import install_certificate
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # orjson is optional; stdlib json also accepts bytes
+    json_loads = json.loads
 
 # Load environment variables
 load_dotenv()
@@ -50,12 +65,112 @@ NAS_PORT = int(os.getenv('NAS_PORT', 445))
 CONFIG_PATH = os.getenv('CONFIG_PATH')
 CLIENT_MACHINE_NAME = os.getenv('CLIENT_MACHINE_NAME')
 PROXY_DOMAIN = os.getenv('PROXY_DOMAIN', 'MAPLE')
+DEBUG = os.getenv('FACTSET_DEBUG') == '1'  # Verbose 🔍 response diagnostics
+CLEANUP_SSL_CERT = os.getenv('FACTSET_CLEANUP_CERT') == '1'  # Cert file is shared across runs by default
 
 # Test configuration
 TEST_TICKER = "RY-CA"  # Royal Bank of Canada
 TEST_PERIODS = ["QTR"]  # Just latest quarter
 TEST_CURRENCIES = ["CAD"]  # Just CAD currency
 
+# Metric categories to discover, with their report display names
+FUNDAMENTAL_CATEGORIES = [
+    "INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW", "RATIOS",
+    "FINANCIAL_SERVICES", "INDUSTRY_METRICS", "PENSION_AND_POSTRETIREMENT",
+    "MARKET_DATA", "MISCELLANEOUS", "DATES"
+]
+CATEGORY_DISPLAY = {category: category.replace('_', ' ').title() for category in FUNDAMENTAL_CATEGORIES}
+
+# Date range for recent data (last 1 year for quick results), computed once per run
+END_DATE_STR = datetime.now().date().strftime('%Y-%m-%d')
+START_DATE_STR = (datetime.now().date() - timedelta(days=365)).strftime('%Y-%m-%d')
+
+# Request model instances that never change between calls
+UPDATE_TYPE_RP = UpdateType("RP")
+BATCH_N = Batch("N")
+
+# JSON key -> SDK attribute name, so raw responses match the models' to_dict() keys
+FUNDAMENTAL_FIELDS = {json_key: name for name, json_key in Fundamental.attribute_map.items()}
+METRIC_FIELDS = {json_key: name for name, json_key in Metric.attribute_map.items()}
+
+# Concurrency and rate limiting for FactSet requests
+MAX_WORKERS = int(os.getenv('FACTSET_CONCURRENCY', '8'))
+RATE_LIMIT = float(os.getenv('FACTSET_RATE_LIMIT', '10'))  # Requests per second
+CONNECTION_POOL_MAXSIZE = max(32, MAX_WORKERS)  # Never smaller than the worker pool
+
+rate_limiter = TokenBucket(RATE_LIMIT)
+
+# Retry settings for throttled (429) and transient server (5xx) responses
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.3  # Seconds
+MAX_BACKOFF_DELAY = 10.0  # Seconds
+
+call_with_retry = partial(
+    throttled_call, rate_limiter=rate_limiter, max_retries=MAX_RETRIES,
+    base_delay=RETRY_BASE_DELAY, max_delay=MAX_BACKOFF_DELAY
+)
+
+# Local disk cache for API responses
+CACHE_DIR = Path(__file__).parent / ".cache"
+METRICS_CACHE_TTL_DAYS = 30
+FUNDAMENTALS_CACHE_TTL_DAYS = 7  # The request window rolls with today's date, so keep this short
+EMPTY_CACHE_TTL_DAYS = 1  # Empty replies may be transient, so they are re-requested sooner
+
+class FileCache:
+    """JSON file cache stored as {root}/{endpoint}/{ticker}/{md5(params)}.json with a per-read TTL."""
+    
+    def __init__(self, root: Path = CACHE_DIR):
+        self.root = root
+    
+    def _path(self, endpoint: str, ticker: str, params: Dict[str, Any]) -> Path:
+        key = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return self.root / endpoint / ticker / f"{key}.json"
+    
+    def get(self, endpoint: str, ticker: str, params: Dict[str, Any], ttl_days: float) -> Optional[Any]:
+        """Return the cached data, or None if missing, unreadable or older than the TTL.
+        
+        Empty entries expire after EMPTY_CACHE_TTL_DAYS when that is shorter than the TTL.
+        """
+        path = self._path(endpoint, ticker, params)
+        try:
+            entry = json_loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        
+        data = entry.get('data')
+        if not data:
+            ttl_days = min(ttl_days, EMPTY_CACHE_TTL_DAYS)
+        if time.time() - entry.get('ts', 0) >= ttl_days * 86400:
+            return None
+        return data
+    
+    def set(self, endpoint: str, ticker: str, params: Dict[str, Any], data: Any):
+        """Write an entry atomically so concurrent readers never see a partial file."""
+        path = self._path(endpoint, ticker, params)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'ts': time.time(), 'data': data}, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"    ⚠️  Could not write cache entry {path}: {e}")
+    
+    def get_or_fetch(self, endpoint: str, ticker: str, params: Dict[str, Any], ttl_days: float, loader):
+        """Return cached data if fresh, otherwise call loader() and cache its result.
+        
+        Empty results are cached too, but only for EMPTY_CACHE_TTL_DAYS (see get).
+        """
+        cached = self.get(endpoint, ticker, params, ttl_days)
+        if cached is not None:
+            return cached
+        
+        data = loader()
+        self.set(endpoint, ticker, params, data)
+        return data
+
+response_cache = FileCache()
+
 # Validate required environment variables
 required_env_vars = [
     'API_USERNAME', 'API_PASSWORD', 'PROXY_USER', 'PROXY_PASSWORD', 'PROXY_URL',
@@ -94,9 +209,9 @@ def nas_download_file(conn: SMBConnection, nas_file_path: str) -> Optional[bytes
     """Download a file from NAS and return as bytes."""
     try:
         file_obj = io.BytesIO()
-        conn.retrieveFile(NAS_SHARE_NAME, nas_file_path, file_obj)
-        file_obj.seek(0)
-        return file_obj.read()
+        # Whole-file read from offset 0; pysmb sizes each SMB2 read from the server's negotiated max
+        conn.retrieveFileFromOffset(NAS_SHARE_NAME, nas_file_path, file_obj, offset=0, max_length=-1)
+        return file_obj.getvalue()
     except Exception as e:
         print(f"❌ Failed to download file from NAS {nas_file_path}: {e}")
         return None
@@ -108,7 +223,7 @@ def load_config(nas_conn: SMBConnection) -> Dict[str, Any]:
         config_data = nas_download_file(nas_conn, CONFIG_PATH)
         
         if config_data:
-            config = json.loads(config_data.decode('utf-8'))
+            config = json_loads(config_data)
             print("✅ Successfully loaded configuration from NAS")
             return config
         else:
@@ -120,20 +235,15 @@ def load_config(nas_conn: SMBConnection) -> Dict[str, Any]:
         return None
 
 def setup_ssl_certificate(nas_conn: SMBConnection, ssl_cert_path: str) -> Optional[str]:
-    """Download SSL certificate from NAS and set up for use."""
+    """Download SSL certificate from NAS and set up for use (shared per user, see factset_ssl)."""
     try:
         print("🔒 Downloading SSL certificate from NAS...")
         cert_data = nas_download_file(nas_conn, ssl_cert_path)
         if cert_data:
-            temp_cert = tempfile.NamedTemporaryFile(mode='wb', suffix='.cer', delete=False)
-            temp_cert.write(cert_data)
-            temp_cert.close()
-            
-            os.environ["REQUESTS_CA_BUNDLE"] = temp_cert.name
-            os.environ["SSL_CERT_FILE"] = temp_cert.name
+            cert_path = install_certificate(cert_data)
             
             print("✅ SSL certificate downloaded from NAS")
-            return temp_cert.name
+            return str(cert_path)
         else:
             print("❌ Failed to download SSL certificate from NAS")
             return None
@@ -141,36 +251,60 @@ def setup_ssl_certificate(nas_conn: SMBConnection, ssl_cert_path: str) -> Option
         print(f"❌ Error downloading SSL certificate from NAS: {e}")
         return None
 
+def decode_records(payload, field_names: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Decode a raw API JSON body into records keyed like the SDK's to_dict() output."""
+    records = json_loads(payload).get('data') or []
+    return [
+        {field_names.get(key, key): value for key, value in record.items()}
+        for record in records
+    ]
+
+def fetch_category_metrics(data_api: metrics_api.MetricsApi, category: str) -> List[Dict[str, Any]]:
+    """Fetch the metric definitions for a single category (served from the disk cache when fresh)."""
+    def load_metrics() -> List[Dict[str, Any]]:
+        print(f"  🔍 Fetching {category} metrics...")
+        response = call_with_retry(
+            data_api.get_fds_fundamentals_metrics, category=category, _preload_content=False
+        )
+        payload = getattr(response, 'data', None)
+        
+        if isinstance(payload, (bytes, bytearray, str)):
+            return decode_records(payload, METRIC_FIELDS)
+        return [metric.to_dict() for metric in payload] if payload else []
+    
+    return response_cache.get_or_fetch(
+        'metrics', 'ALL', {'category': category}, METRICS_CACHE_TTL_DAYS, load_metrics
+    )
+
 def get_available_metrics(data_api: metrics_api.MetricsApi) -> Dict[str, List[Dict[str, Any]]]:
     """Get all available metrics by category."""
     print("📊 Discovering all available fundamental metrics...")
     
-    categories = [
-        "INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW", "RATIOS",
-        "FINANCIAL_SERVICES", "INDUSTRY_METRICS", "PENSION_AND_POSTRETIREMENT",
-        "MARKET_DATA", "MISCELLANEOUS", "DATES"
-    ]
+    categories = FUNDAMENTAL_CATEGORIES
     
-    all_metrics = {}
+    # Pre-seed in category order so the report layout doesn't depend on completion order
+    all_metrics = {category: [] for category in categories}
     
-    for category in categories:
-        try:
-            print(f"  🔍 Fetching {category} metrics...")
-            response = data_api.get_fds_fundamentals_metrics(category=category)
+    # Categories are independent requests, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=min(len(categories), MAX_WORKERS)) as executor:
+        futures = {
+            executor.submit(fetch_category_metrics, data_api, category): category
+            for category in categories
+        }
+        
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                metrics = future.result()
+            except Exception as e:
+                print(f"    ❌ Error fetching {category} metrics: {e}")
+                continue
             
-            if response and hasattr(response, 'data') and response.data:
-                metrics = [metric.to_dict() for metric in response.data]
+            if metrics:
                 all_metrics[category] = metrics
                 print(f"    ✅ Found {len(metrics)} {category} metrics")
             else:
                 print(f"    ⚠️  No metrics found for {category}")
-                all_metrics[category] = []
-                
-            time.sleep(0.5)  # Rate limiting
-            
-        except Exception as e:
-            print(f"    ❌ Error fetching {category} metrics: {e}")
-            all_metrics[category] = []
     
     return all_metrics
 
@@ -180,34 +314,67 @@ def group_metrics_by_data_type(metrics: List[Dict[str, Any]]) -> Dict[str, List[
     CRITICAL: FactSet API does not support mixing data types in single request.
     Array types (floatArray, doubleArray, etc.) need separate processing.
     """
-    grouped = {}
+    grouped = defaultdict(list)
     array_types = ['floatArray', 'doubleArray', 'intArray', 'stringArray']
     
     for metric in metrics:
-        data_type = metric.get('data_type', 'Unknown')
+        codes = grouped[metric.get('data_type', 'Unknown')]
         metric_code = metric.get('metric')
-        
-        if data_type not in grouped:
-            grouped[data_type] = []
         if metric_code:
-            grouped[data_type].append(metric_code)
+            codes.append(metric_code)
     
     # Debug: Show array vs scalar type breakdown
-    array_count = sum(len(grouped.get(dt, [])) for dt in array_types if dt in grouped)
-    scalar_count = sum(len(metrics) for dt, metrics in grouped.items() if dt not in array_types)
-    
-    if array_count > 0:
-        print(f"    🔍 Found {array_count} array-type metrics, {scalar_count} scalar-type metrics")
+    if DEBUG:
+        array_count = sum(len(grouped.get(dt, [])) for dt in array_types if dt in grouped)
+        scalar_count = sum(len(metrics) for dt, metrics in grouped.items() if dt not in array_types)
+        
+        if array_count > 0:
+            print(f"    🔍 Found {array_count} array-type metrics, {scalar_count} scalar-type metrics")
     
-    return grouped
+    return dict(grouped)
+
+@lru_cache(maxsize=None)
+def get_fiscal_period(start_date: str, end_date: str) -> FiscalPeriod:
+    """Return a shared FiscalPeriod model for a date window."""
+    return FiscalPeriod(start=start_date, end=end_date)
+
+@lru_cache(maxsize=None)
+def get_ids(ticker: str) -> IdsBatchMax30000:
+    """Return a shared single-ticker ids model."""
+    return IdsBatchMax30000([ticker])
+
+@lru_cache(maxsize=None)
+def get_periodicity(periodicity: str) -> Periodicity:
+    """Return a shared Periodicity model."""
+    return Periodicity(periodicity)
+
+@lru_cache(maxsize=None)
+def get_metrics(metric_codes: Tuple[str, ...]) -> Metrics:
+    """Return a shared Metrics model for a metric list (keyed as a tuple)."""
+    return Metrics(list(metric_codes))
 
 def get_fundamental_data(fund_api: fact_set_fundamentals_api.FactSetFundamentalsApi, 
                         ticker: str, 
                         metrics: List[str], 
                         periodicity: str = "QTR",
                         currency: str = "CAD",
-                        data_type: str = "float") -> Optional[List[Dict[str, Any]]]:
-    """Get fundamental data for specific metrics."""
+                        data_type: str = "float",
+                        start_date: str = START_DATE_STR,
+                        end_date: str = END_DATE_STR) -> Optional[List[Dict[str, Any]]]:
+    """Get fundamental data for specific metrics (served from the disk cache when fresh)."""
+    cache_params = {
+        'metrics': sorted(metrics),
+        'periodicity': periodicity,
+        'currency': currency,
+        'data_type': data_type,
+        'start_date': start_date,
+        'end_date': end_date
+    }
+    cached_data = response_cache.get('fundamentals', ticker, cache_params, FUNDAMENTALS_CACHE_TTL_DAYS)
+    if cached_data is not None:
+        print(f"  💾 Using {len(cached_data)} cached {data_type} data points for {ticker} ({periodicity}, {currency})")
+        return cached_data or None
+    
     try:
         array_types = ['floatArray', 'doubleArray', 'intArray', 'stringArray']
         is_array_type = data_type in array_types
@@ -218,25 +385,15 @@ def get_fundamental_data(fund_api: fact_set_fundamentals_api.FactSetFundamentals
         if is_array_type:
             print(f"    🔍 Processing array-type metrics ({data_type}) - may need extended time")
         
-        # Add date range for recent data (last 1 year for quick results)
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=365)
-        
         # Create request object with proper model class wrapping
         # CRITICAL: All parameters must be wrapped in their respective model classes
-        ids_instance = IdsBatchMax30000([ticker])
-        metrics_instance = Metrics(metrics)
-        periodicity_instance = Periodicity(periodicity)
-        update_type_instance = UpdateType("RP")
+        # (cached, so repeated combinations skip the SDK's model validation)
+        ids_instance = get_ids(ticker)
+        metrics_instance = get_metrics(tuple(metrics))
+        periodicity_instance = get_periodicity(periodicity)
         
         # CRITICAL: Add fiscal_period parameter (required in v2.0.0+)
-        fiscal_period_instance = FiscalPeriod(
-            start=start_date.strftime('%Y-%m-%d'),
-            end=end_date.strftime('%Y-%m-%d')
-        )
-        
-        # Add batch parameter for better performance
-        batch_instance = Batch("N")  # N for non-batch, Y for batch requests
+        fiscal_period_instance = get_fiscal_period(start_date, end_date)
         
         request_data = FundamentalRequestBody(
             ids=ids_instance,
@@ -244,161 +401,105 @@ def get_fundamental_data(fund_api: fact_set_fundamentals_api.FactSetFundamentals
             periodicity=periodicity_instance,
             fiscal_period=fiscal_period_instance,
             currency=currency,
-            update_type=update_type_instance,
-            batch=batch_instance
+            update_type=UPDATE_TYPE_RP,
+            batch=BATCH_N  # N for non-batch, Y for batch requests
         )
         
         request = FundamentalsRequest(data=request_data)
         
-        response_wrapper = fund_api.get_fds_fundamentals_for_list(request)
+        # Ask for the raw HTTP response so the JSON body can be decoded without building SDK models
+        response_wrapper = call_with_retry(
+            fund_api.get_fds_fundamentals_for_list, request, _preload_content=False
+        )
+        payload = getattr(response_wrapper, 'data', None)
         
-        # Unwrap the response as shown in API documentation
-        if hasattr(response_wrapper, 'get_response_200'):
-            response = response_wrapper.get_response_200()
+        if isinstance(payload, (bytes, bytearray, str)):
+            data = decode_records(payload, FUNDAMENTAL_FIELDS)
+            if DEBUG:
+                print(f"    🔍 Response received: {len(payload)} bytes, {len(data)} records")
         else:
-            response = response_wrapper
-        
-        # Debug: Print response details
-        print(f"    🔍 Response received: {response is not None}")
-        if response:
-            print(f"    🔍 Response type: {type(response)}")
-            print(f"    🔍 Response attributes: {dir(response)}")
-            print(f"    🔍 Response has data attribute: {hasattr(response, 'data')}")
-            
-            # Check if it's a wrapper that needs to be unwrapped
-            if hasattr(response, 'get_response_200'):
-                print(f"    🔍 Response has get_response_200 method - unwrapping...")
-                actual_response = response.get_response_200()
-                print(f"    🔍 Unwrapped response type: {type(actual_response)}")
-                print(f"    🔍 Unwrapped response attributes: {dir(actual_response)}")
-                if hasattr(actual_response, 'data'):
-                    print(f"    🔍 Unwrapped response has data: {actual_response.data is not None}")
-                    if actual_response.data:
-                        print(f"    🔍 Unwrapped response data length: {len(actual_response.data)}")
-                        response = actual_response  # Use the unwrapped response
-            
-            if hasattr(response, 'data'):
-                print(f"    🔍 Response data is not None: {response.data is not None}")
-                if response.data:
-                    print(f"    🔍 Response data length: {len(response.data)}")
+            # Unwrap the response once, as shown in API documentation
+            try:
+                response = response_wrapper.get_response_200()
+            except AttributeError:
+                response = response_wrapper
+            try:
+                response_data = response.data or []
+            except AttributeError:
+                response_data = []
+            
+            if DEBUG:
+                print(f"    🔍 Response received: {response is not None}")
+                if response:
+                    print(f"    🔍 Response type: {type(response)}")
+                    print(f"    🔍 Response attributes: {dir(response)}")
+                    print(f"    🔍 Response data length: {len(response_data)}")
+            
+            data = [item.to_dict() for item in response_data]
         
-        if response and hasattr(response, 'data') and response.data:
-            data = [item.to_dict() for item in response.data]
+        if data:
             print(f"    ✅ Retrieved {len(data)} data points")
+            response_cache.set('fundamentals', ticker, cache_params, data)
             return data
         else:
             print(f"    ⚠️  No data returned for {ticker}")
-            # Debug: Print what metrics were requested
-            print(f"    🔍 Requested metrics: {metrics[:5]}{'...' if len(metrics) > 5 else ''}")
+            response_cache.set('fundamentals', ticker, cache_params, [])
+            if DEBUG:
+                print(f"    🔍 Requested metrics: {metrics[:5]}{'...' if len(metrics) > 5 else ''}")
             return None
             
     except Exception as e:
         print(f"    ❌ Error fetching fundamental data: {e}")
-        print(f"    🔍 Error type: {type(e).__name__}")
-        print(f"    🔍 Requested metrics: {metrics[:5]}{'...' if len(metrics) > 5 else ''}")
+        if DEBUG:
+            print(f"    🔍 Error type: {type(e).__name__}")
+            print(f"    🔍 Requested metrics: {metrics[:5]}{'...' if len(metrics) > 5 else ''}")
         return None
 
-def analyze_data_coverage(data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze data coverage and completeness."""
-    if not data:
-        return {"total_points": 0, "metrics_with_data": 0, "date_range": None}
-    
-    # Group by metric
+def analyze_data_coverage(data: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Analyze data coverage and completeness in a single pass over the data points."""
+    # Group by metric (in first-seen order), tracking the date range as running bounds
+    total_points = 0
     metrics_data = {}
-    all_dates = set()
+    min_date = max_date = None
     
     for item in data:
+        total_points += 1
         metric = item.get('metric')
         value = item.get('value')
+        if not metric or value is None:
+            continue
+        
         fiscal_end_date = item.get('fiscal_end_date')
+        points = metrics_data.get(metric)
+        if points is None:
+            points = metrics_data[metric] = []
+        points.append({
+            'value': value,
+            'date': fiscal_end_date,
+            'fiscal_year': item.get('fiscal_year'),
+            'fiscal_period': item.get('fiscal_period')
+        })
         
-        if metric and value is not None:
-            if metric not in metrics_data:
-                metrics_data[metric] = []
-            metrics_data[metric].append({
-                'value': value,
-                'date': fiscal_end_date,
-                'fiscal_year': item.get('fiscal_year'),
-                'fiscal_period': item.get('fiscal_period')
-            })
-            if fiscal_end_date:
-                all_dates.add(fiscal_end_date)
-    
-    # Calculate coverage stats
-    date_range = None
-    if all_dates:
-        min_date = min(all_dates)
-        max_date = max(all_dates)
-        date_range = f"{min_date} to {max_date}"
+        if fiscal_end_date:
+            if min_date is None or fiscal_end_date < min_date:
+                min_date = fiscal_end_date
+            if max_date is None or fiscal_end_date > max_date:
+                max_date = fiscal_end_date
+    
+    if not total_points:
+        return {"total_points": 0, "metrics_with_data": 0, "date_range": None}
     
     return {
-        "total_points": len(data),
+        "total_points": total_points,
         "metrics_with_data": len(metrics_data),
         "unique_metrics": list(metrics_data.keys()),
-        "date_range": date_range,
+        "date_range": f"{min_date} to {max_date}" if min_date is not None else None,
         "metrics_data": metrics_data
     }
 
-def format_metric_info(metric: Dict[str, Any]) -> str:
-    """Format metric information for display."""
-    metric_name = metric.get('metric', 'Unknown')
-    description = metric.get('description', 'No description')
-    data_type = metric.get('data_type', 'Unknown')
-    
-    # Truncate long descriptions
-    if len(description) > 80:
-        description = description[:77] + "..."
-    
-    return f"    {metric_name:<20} | {data_type:<8} | {description}"
-
-def display_sample_data(metrics_data: Dict[str, List[Dict[str, Any]]], max_metrics: int = 10):
-    """Display sample data for top metrics."""
-    print(f"\n📊 Sample Data (showing up to {max_metrics} metrics with most data points):")
-    print("-" * 100)
-    
-    # Sort metrics by number of data points
-    sorted_metrics = sorted(metrics_data.items(), key=lambda x: len(x[1]), reverse=True)
-    
-    for i, (metric, values) in enumerate(sorted_metrics[:max_metrics]):
-        print(f"\n🔹 {metric} ({len(values)} data points):")
-        
-        # Show most recent 5 data points
-        recent_values = sorted(values, key=lambda x: x.get('date', ''), reverse=True)[:5]
-        
-        for val in recent_values:
-            date = val.get('date', 'Unknown')
-            value = val.get('value', 'N/A')
-            fy = val.get('fiscal_year', 'N/A')
-            fp = val.get('fiscal_period', 'N/A')
-            
-            # Format value based on type
-            if isinstance(value, (int, float)):
-                if abs(value) >= 1000000:
-                    formatted_value = f"{value/1000000:.1f}M"
-                elif abs(value) >= 1000:
-                    formatted_value = f"{value/1000:.1f}K"
-                else:
-                    formatted_value = f"{value:.2f}"
-            else:
-                formatted_value = str(value)
-            
-            print(f"    {date} | FY{fy} Q{fp} | {formatted_value}")
-
-def generate_html_report(all_metrics: Dict[str, List[Dict[str, Any]]], 
-                        category_results: Dict[str, Dict[str, Any]], 
-                        ticker: str) -> str:
-    """Generate clean data-focused HTML report showing actual metrics and sample data."""
-    
-    # Generate HTML
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>FactSet Fundamentals Data - {ticker}</title>
-        <style>
-            body {{
+# Static stylesheet embedded in every HTML report
+REPORT_STYLE = """        <style>
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
                 line-height: 1.5;
                 color: #333;
@@ -406,100 +507,205 @@ def generate_html_report(all_metrics: Dict[str, List[Dict[str, Any]]],
                 margin: 0 auto;
                 padding: 20px;
                 background-color: #f8f9fa;
-            }}
-            .header {{
+            }
+            .header {
                 background: #fff;
                 padding: 20px;
                 border-radius: 8px;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                 margin-bottom: 20px;
                 text-align: center;
-            }}
-            .category-section {{
+            }
+            .category-section {
                 background: #fff;
                 margin-bottom: 30px;
                 border-radius: 8px;
                 overflow: hidden;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .category-header {{
+            }
+            .category-header {
                 background: #495057;
                 color: white;
                 padding: 15px 20px;
                 font-size: 1.2em;
                 font-weight: bold;
                 margin: 0;
-            }}
-            .metrics-table {{
+            }
+            .metrics-table {
                 width: 100%;
                 border-collapse: collapse;
-            }}
-            .metrics-table th {{
+            }
+            .metrics-table th {
                 background: #6c757d;
                 color: white;
                 padding: 10px;
                 text-align: left;
                 font-weight: normal;
                 font-size: 0.9em;
-            }}
-            .metrics-table td {{
+            }
+            .metrics-table td {
                 padding: 8px 10px;
                 border-bottom: 1px solid #dee2e6;
                 font-size: 0.85em;
                 vertical-align: top;
-            }}
-            .metrics-table tr:hover {{
+            }
+            .metrics-table tr:hover {
                 background: #f8f9fa;
-            }}
-            .metric-code {{
+            }
+            .metric-code {
                 font-family: 'Monaco', 'Consolas', monospace;
                 font-weight: bold;
                 color: #0056b3;
-            }}
-            .data-type {{
+            }
+            .data-type {
                 color: #6c757d;
                 font-size: 0.8em;
-            }}
-            .description {{
+            }
+            .description {
                 color: #333;
                 max-width: 400px;
-            }}
-            .sample-data {{
+            }
+            .sample-data {
                 background: #f8f9fa;
                 padding: 8px;
                 border-radius: 4px;
                 font-family: 'Monaco', 'Consolas', monospace;
                 font-size: 0.8em;
                 color: #0056b3;
-            }}
-            .no-data {{
+            }
+            .no-data {
                 color: #6c757d;
                 font-style: italic;
-            }}
-            .timestamp {{
+            }
+            .timestamp {
                 color: #6c757d;
                 font-size: 0.9em;
                 text-align: center;
                 margin-top: 30px;
                 padding: 20px;
-            }}
+            }
         </style>
-    </head>
+"""
+
+# Console separator lines
+RULE = "=" * 80
+SEP = "-" * 80
+SUB_SEP = "-" * 60
+
+# (threshold, suffix) pairs for abbreviating large numbers, largest first
+MAGNITUDE_SCALES = ((1e9, 'B'), (1e6, 'M'), (1e3, 'K'))
+
+# Sample data points from analyze_data_coverage always carry these keys
+_sample_fields = itemgetter('date', 'value', 'fiscal_year', 'fiscal_period')
+
+# Sort/max key for analyze_data_coverage results
+_total_points = itemgetter('total_points')
+
+def format_magnitude(value: float) -> str:
+    """Format a number with a B/M/K suffix (two decimals below one thousand)."""
+    magnitude = abs(value)
+    for threshold, suffix in MAGNITUDE_SCALES:
+        if magnitude >= threshold:
+            return f"{value/threshold:.1f}{suffix}"
+    return f"{value:.2f}"
+
+def format_metric_info(metric: Dict[str, Any]) -> str:
+    """Format metric information for display."""
+    metric_name = metric.get('metric', 'Unknown')
+    description = metric.get('description', 'No description')
+    data_type = metric.get('data_type', 'Unknown')
+    
+    # Truncate long descriptions
+    if len(description) > 80:
+        description = description[:77] + "..."
+    
+    return f"    {metric_name:<20} | {data_type:<8} | {description}"
+
+def display_sample_data(metrics_data: Dict[str, List[Dict[str, Any]]], max_metrics: int = 10):
+    """Display sample data for top metrics."""
+    print(f"\n📊 Sample Data (showing up to {max_metrics} metrics with most data points):")
+    print("-" * 100)
+    
+    # Sort metrics by number of data points
+    sorted_metrics = sorted(metrics_data.items(), key=lambda x: len(x[1]), reverse=True)
+    
+    for i, (metric, values) in enumerate(sorted_metrics[:max_metrics]):
+        print(f"\n🔹 {metric} ({len(values)} data points):")
+        
+        # Show most recent 5 data points
+        recent_values = sorted(values, key=lambda x: x.get('date', ''), reverse=True)[:5]
+        
+        for val in recent_values:
+            try:
+                date, value, fy, fp = _sample_fields(val)
+            except KeyError:
+                date = val.get('date', 'Unknown')
+                value = val.get('value', 'N/A')
+                fy = val.get('fiscal_year', 'N/A')
+                fp = val.get('fiscal_period', 'N/A')
+            
+            # Format value based on type
+            if isinstance(value, (int, float)):
+                formatted_value = format_magnitude(value)
+            else:
+                formatted_value = str(value)
+            
+            print(f"    {date} | FY{fy} Q{fp} | {formatted_value}")
+
+NO_DATA_HTML = "<span class='no-data'>No data available</span>"
+
+def render_sample_html(points: List[Dict[str, Any]]) -> str:
+    """Render the two most recent data points of a metric for the HTML sample cell."""
+    sample_parts = ["<div class='sample-data'>"]
+    for data_point in points[:2]:
+        try:
+            date, value = _sample_fields(data_point)[:2]
+        except KeyError:
+            value = data_point.get('value', 'N/A')
+            date = data_point.get('date', 'Unknown')
+        
+        # Format value
+        if isinstance(value, (int, float)):
+            formatted_value = format_magnitude(value)
+        else:
+            formatted_value = str(value)[:20]
+        
+        sample_parts.append(f"{formatted_value} ({date})<br>")
+    sample_parts.append("</div>")
+    return ''.join(sample_parts)
+
+def write_html_report(html: TextIO,
+                      all_metrics: Dict[str, List[Dict[str, Any]]], 
+                      category_results: Dict[str, Dict[str, Any]], 
+                      ticker: str):
+    """Write clean data-focused HTML report showing actual metrics and sample data.
+    
+    Sections are written to the given text stream as they are built, so the
+    report can go straight to disk without holding the whole document in memory.
+    """
+    html.write(f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>FactSet Fundamentals Data - {ticker}</title>
+{REPORT_STYLE}    </head>
     <body>
         <div class="header">
             <h1>FactSet Fundamentals Data Reference</h1>
             <h2>{ticker} - Royal Bank of Canada</h2>
             <p>Available metrics and sample data by category</p>
         </div>
-    """
+    """)
     
     # Add each category section
     for category, metrics in all_metrics.items():
         if not metrics:
             continue
             
-        category_name = category.replace('_', ' ').title()
-        html_content += f"""
+        category_name = CATEGORY_DISPLAY.get(category) or category.replace('_', ' ').title()
+        html.write(f"""
         <div class="category-section">
             <h3 class="category-header">{category_name} ({len(metrics)} metrics)</h3>
             <table class="metrics-table">
@@ -512,16 +718,24 @@ def generate_html_report(all_metrics: Dict[str, List[Dict[str, Any]]],
                     </tr>
                 </thead>
                 <tbody>
-        """
+        """)
         
         # Get sample data for this category
         cat_data = category_results.get(category, {})
         sample_data = {}
         if cat_data:
-            best_result = max(cat_data.values(), key=lambda x: x.get('total_points', 0))
+            best_result = max(cat_data.values(), key=_total_points)
             sample_data = best_result.get('metrics_data', {})
         
+        # Render each metric's sample cell once, up front
+        sample_html_by_code = {
+            code: render_sample_html(points)
+            for code, points in sample_data.items()
+            if points
+        }
+        
         # Add rows for each metric
+        rows = []
         for metric in metrics:
             metric_code = metric.get('metric', 'Unknown')
             data_type = metric.get('data_type', 'Unknown')
@@ -531,68 +745,44 @@ def generate_html_report(all_metrics: Dict[str, List[Dict[str, Any]]],
             if len(description) > 100:
                 description = description[:97] + "..."
             
-            # Get sample data for this metric
-            if metric_code in sample_data and sample_data[metric_code]:
-                recent_data = sample_data[metric_code][:2]  # Show 2 most recent
-                sample_html = "<div class='sample-data'>"
-                for data_point in recent_data:
-                    value = data_point.get('value', 'N/A')
-                    date = data_point.get('date', 'Unknown')
-                    fy = data_point.get('fiscal_year', '')
-                    fp = data_point.get('fiscal_period', '')
-                    
-                    # Format value
-                    if isinstance(value, (int, float)):
-                        if abs(value) >= 1000000000:
-                            formatted_value = f"{value/1000000000:.1f}B"
-                        elif abs(value) >= 1000000:
-                            formatted_value = f"{value/1000000:.1f}M"
-                        elif abs(value) >= 1000:
-                            formatted_value = f"{value/1000:.1f}K"
-                        else:
-                            formatted_value = f"{value:.2f}"
-                    else:
-                        formatted_value = str(value)[:20]
-                    
-                    sample_html += f"{formatted_value} ({date})<br>"
-                sample_html += "</div>"
-            else:
-                sample_html = "<span class='no-data'>No data available</span>"
+            sample_html = sample_html_by_code.get(metric_code, NO_DATA_HTML)
             
-            html_content += f"""
+            rows.append(f"""
                     <tr>
                         <td class="metric-code">{metric_code}</td>
                         <td class="data-type">{data_type}</td>
                         <td class="description">{description}</td>
                         <td>{sample_html}</td>
                     </tr>
-            """
+            """)
+        html.write(''.join(rows))
         
-        html_content += """
+        html.write("""
                 </tbody>
             </table>
         </div>
-        """
+        """)
     
-    html_content += f"""
+    html.write(f"""
         <div class="timestamp">
             Report generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         </div>
     </body>
     </html>
-    """
-    
-    return html_content
+    """)
 
 def main():
     """Main function to test FactSet Fundamentals API."""
-    print("\n" + "="*80)
+    # Retry notices from factset_throttle are logged; show them inline with the printed progress
+    logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[logging.StreamHandler(sys.stdout)])
+    
+    print("\n" + RULE)
     print("🏦 FACTSET FUNDAMENTALS API COMPREHENSIVE TEST")
-    print("="*80)
+    print(RULE)
     print(f"🎯 Testing institution: {TEST_TICKER} (Royal Bank of Canada)")
     print(f"📅 Testing periods: {', '.join(TEST_PERIODS)}")
     print(f"💰 Testing currencies: {', '.join(TEST_CURRENCIES)}")
-    print("="*80)
+    print(RULE)
     
     # Connect to NAS and load configuration
     nas_conn = get_nas_connection()
@@ -624,8 +814,14 @@ def main():
     )
     # CRITICAL: Add authentication token (missing in original code)
     configuration.get_basic_auth_token()
+    # Size the shared urllib3 pool so every worker thread reuses a kept-alive connection
+    configuration.connection_pool_maxsize = CONNECTION_POOL_MAXSIZE
     print("✅ FactSet Fundamentals API client configured")
     
+    # The NAS is not needed past this point, so let its teardown overlap with the API work
+    io_pool = ThreadPoolExecutor(max_workers=1)
+    nas_close = io_pool.submit(nas_conn.close)
+    
     try:
         with fds.sdk.FactSetFundamentals.ApiClient(configuration) as api_client:
             # Initialize API instances
@@ -634,13 +830,13 @@ def main():
             
             # Phase 1: Discover all available metrics
             print("\n🔍 PHASE 1: DISCOVERING ALL AVAILABLE METRICS")
-            print("="*80)
+            print(RULE)
             
             all_metrics = get_available_metrics(data_api)
             
             # Display metrics summary
-            print(f"\n📋 METRICS SUMMARY BY CATEGORY:")
-            print("-" * 80)
+            print("\n📋 METRICS SUMMARY BY CATEGORY:")
+            print(SEP)
             total_metrics = 0
             
             for category, metrics in all_metrics.items():
@@ -648,7 +844,7 @@ def main():
                 print(f"🔹 {category:<25} | {len(metrics):>4} metrics")
                 
                 if metrics:
-                    print(f"   Sample metrics:")
+                    print("   Sample metrics:")
                     for metric in metrics[:3]:  # Show first 3 metrics
                         print(f"     {format_metric_info(metric)}")
                     if len(metrics) > 3:
@@ -657,79 +853,107 @@ def main():
             
             print(f"📊 TOTAL AVAILABLE METRICS: {total_metrics}")
             
+            # Metric lists are fixed after Phase 1, so group them by data type once
+            grouped_all = {
+                category: group_metrics_by_data_type(metrics)
+                for category, metrics in all_metrics.items()
+                if metrics
+            }
+            metrics_count = {category: len(metrics) for category, metrics in all_metrics.items()}
+            
             # Phase 2: Test data retrieval for each category
             print(f"\n🔍 PHASE 2: TESTING DATA RETRIEVAL FOR {TEST_TICKER}")
-            print("="*80)
+            print(RULE)
             
             category_results = {}
             
+            # Build the full work list up front so every request can run concurrently
+            metrics_by_type = {}
+            metric_categories = {}
             for category, metrics in all_metrics.items():
                 if not metrics:
                     continue
                     
-                print(f"\n🔹 Testing {category} ({len(metrics)} metrics available)")
-                print("-" * 60)
+                print(f"\n🔹 Preparing {category} ({len(metrics)} metrics available)")
+                print(SUB_SEP)
                 
                 # Group metrics by data type to ensure consistent API requests
-                grouped_metrics = group_metrics_by_data_type(metrics)
+                grouped_metrics = grouped_all[category]
                 
                 if not grouped_metrics:
                     print(f"  ⚠️  No valid metrics found for {category}")
                     continue
                 
                 # Display data type breakdown
-                print(f"  📊 Data types found:")
+                print("  📊 Data types found:")
                 for data_type, metric_list in grouped_metrics.items():
                     print(f"    {data_type}: {len(metric_list)} metrics")
                 
-                # Test with different periodicities and currencies
-                category_data = {}
+                # Pool each data type's test metrics across categories so one request covers them all
+                category_results[category] = {}
+                for data_type, metric_codes in grouped_metrics.items():
+                    # For quick overview, test just a few metrics per data type
+                    for metric_code in metric_codes[:5]:  # Just 5 metrics per type for quick overview
+                        if metric_code not in metric_categories:
+                            metrics_by_type.setdefault(data_type, []).append(metric_code)
+                        metric_categories.setdefault(metric_code, []).append(category)
+            
+            # Test with different periodicities and currencies, one request per data type
+            work_items = [
+                (periodicity, currency, data_type, metric_codes)
+                for periodicity in TEST_PERIODS
+                for currency in TEST_CURRENCIES
+                for data_type, metric_codes in metrics_by_type.items()
+            ]
+            
+            # Fetch all (period, currency, data type) groups on a bounded worker pool
+            print(f"\n🚀 Fetching {len(work_items)} data type groups with up to {MAX_WORKERS} workers...")
+            fetched_data = {}
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                futures = {
+                    executor.submit(
+                        get_fundamental_data, fund_api, TEST_TICKER, metric_codes, periodicity, currency, data_type,
+                        START_DATE_STR, END_DATE_STR
+                    ): (f"{periodicity}_{currency}", data_type)
+                    for periodicity, currency, data_type, metric_codes in work_items
+                }
+                
+                for future in as_completed(futures):
+                    period_key, data_type = futures[future]
+                    data = future.result()
+                    
+                    if not data:
+                        print(f"      ❌ No data for {data_type} metrics")
+                        continue
+                    
+                    # Split the pooled response back out to the categories that asked for each metric
+                    for item in data:
+                        for category in metric_categories.get(item.get('metric'), ()):
+                            fetched_data.setdefault((category, period_key), []).append(item)
+                    print(f"      ✅ {len(data)} data points for {data_type} metrics")
+            
+            # Process combined data from all data types, category by category
+            for category, category_data in category_results.items():
+                print(f"\n🔹 {category} results")
+                print(SUB_SEP)
                 
                 for periodicity in TEST_PERIODS:
                     for currency in TEST_CURRENCIES:
-                        print(f"  🔍 Testing {periodicity} data in {currency}...")
-                        
-                        # Test each data type group separately
-                        all_data = []
-                        for data_type, metric_codes in grouped_metrics.items():
-                            if not metric_codes:
-                                continue
-                                
-                            # For quick overview, test just a few metrics per data type
-                            test_metrics = metric_codes[:5]  # Just 5 metrics per type for quick overview
-                            print(f"    📊 Testing {len(test_metrics)} {data_type} metrics...")
-                            
-                            data = get_fundamental_data(
-                                fund_api, TEST_TICKER, test_metrics, periodicity, currency, data_type
-                            )
-                            
-                            if data:
-                                all_data.extend(data)
-                                print(f"      ✅ {len(data)} data points for {data_type} metrics")
-                            else:
-                                print(f"      ❌ No data for {data_type} metrics")
-                            
-                            time.sleep(0.5)  # Rate limiting between data type groups
-                        
-                        # Process combined data from all data types
-                        data = all_data if all_data else None
+                        period_key = f"{periodicity}_{currency}"
+                        data = fetched_data.get((category, period_key))
                         
                         if data:
                             analysis = analyze_data_coverage(data)
-                            category_data[f"{periodicity}_{currency}"] = analysis
+                            category_data[period_key] = analysis
                             
-                            print(f"    ✅ {analysis['total_points']} data points, "
+                            print(f"    ✅ {periodicity} {currency}: {analysis['total_points']} data points, "
                                   f"{analysis['metrics_with_data']} metrics with data")
                         else:
-                            print(f"    ❌ No data returned")
-                        
-                        time.sleep(1)  # Rate limiting
-                
-                category_results[category] = category_data
+                            print(f"    ❌ {periodicity} {currency}: No data returned")
                 
                 # Show best results for this category
                 if category_data:
-                    best_result = max(category_data.values(), key=lambda x: x['total_points'])
+                    best_result = max(category_data.values(), key=_total_points)
                     if best_result['total_points'] > 0:
                         print(f"  🎯 Best coverage: {best_result['total_points']} data points")
                         print(f"     Date range: {best_result['date_range']}")
@@ -739,107 +963,126 @@ def main():
                         if best_result.get('metrics_data'):
                             display_sample_data(best_result['metrics_data'], max_metrics=5)
             
-            # Phase 3: Comprehensive summary
-            print(f"\n🔍 PHASE 3: COMPREHENSIVE SUMMARY")
-            print("="*80)
+            # Phase 3: Comprehensive summary, buffered and written to stdout in one go
+            report = io.StringIO()
+            w = report.write
+            w("\n🔍 PHASE 3: COMPREHENSIVE SUMMARY\n")
+            w(RULE + "\n")
+            
+            # One pass over the results: best (period, currency) result per category
+            summary = {}
+            coverage_pct = {}
+            for category, cat_data in category_results.items():
+                best_result = max(cat_data.values(), key=_total_points, default=None)
+                summary[category] = (best_result, best_result['total_points'] if best_result else 0)
+                metrics_available = metrics_count.get(category, 0)
+                coverage_pct[category] = (
+                    best_result['metrics_with_data'] / metrics_available * 100
+                    if best_result and metrics_available else 0.0
+                )
             
             # Overall statistics
-            total_data_points = sum(
-                max((result.get('total_points', 0) for result in cat_data.values()), default=0)
-                for cat_data in category_results.values()
-            )
-            
-            categories_with_data = sum(
-                1 for cat_data in category_results.values() 
-                if any(result.get('total_points', 0) > 0 for result in cat_data.values())
-            )
-            
-            print(f"📊 OVERALL RESULTS FOR {TEST_TICKER}:")
-            print(f"  🎯 Total available metrics: {total_metrics}")
-            print(f"  📈 Categories with data: {categories_with_data}/{len(all_metrics)}")
-            print(f"  💾 Maximum data points retrieved: {total_data_points}")
-            print()
+            total_data_points = sum(best_points for _, best_points in summary.values())
+            
+            categories_with_data = sum(1 for _, best_points in summary.values() if best_points > 0)
+            
+            w(f"📊 OVERALL RESULTS FOR {TEST_TICKER}:\n")
+            w(f"  🎯 Total available metrics: {total_metrics}\n")
+            w(f"  📈 Categories with data: {categories_with_data}/{len(all_metrics)}\n")
+            w(f"  💾 Maximum data points retrieved: {total_data_points}\n")
+            w("\n")
             
             # Category-by-category results
-            print("📋 CATEGORY-BY-CATEGORY RESULTS:")
-            print("-" * 80)
+            w("📋 CATEGORY-BY-CATEGORY RESULTS:\n")
+            w(SEP + "\n")
             
-            for category, cat_data in category_results.items():
-                if not cat_data:
-                    print(f"🔹 {category:<25} | ❌ No data available")
+            for category, (best_result, best_points) in summary.items():
+                if best_result is None:
+                    w(f"🔹 {category:<25} | ❌ No data available\n")
                     continue
                 
-                best_result = max(cat_data.values(), key=lambda x: x['total_points'])
-                metrics_available = len(all_metrics.get(category, []))
+                metrics_available = metrics_count.get(category, 0)
                 
-                if best_result['total_points'] > 0:
-                    print(f"🔹 {category:<25} | ✅ {best_result['total_points']:>4} data points "
-                          f"| {best_result['metrics_with_data']:>3}/{metrics_available} metrics")
+                if best_points > 0:
+                    w(f"🔹 {category:<25} | ✅ {best_points:>4} data points "
+                      f"| {best_result['metrics_with_data']:>3}/{metrics_available} metrics\n")
                 else:
-                    print(f"🔹 {category:<25} | ⚠️  Available but no data for {TEST_TICKER}")
+                    w(f"🔹 {category:<25} | ⚠️  Available but no data for {TEST_TICKER}\n")
             
             # Business recommendations
-            print(f"\n💡 BUSINESS EVALUATION RECOMMENDATIONS:")
-            print("-" * 80)
+            w("\n💡 BUSINESS EVALUATION RECOMMENDATIONS:\n")
+            w(SEP + "\n")
             
             key_categories = ['INCOME_STATEMENT', 'BALANCE_SHEET', 'CASH_FLOW', 'RATIOS', 'FINANCIAL_SERVICES']
             
             for category in key_categories:
-                if category in category_results:
-                    best_result = max(category_results[category].values(), key=lambda x: x['total_points'])
-                    if best_result['total_points'] > 0:
-                        coverage = (best_result['metrics_with_data'] / len(all_metrics.get(category, []))) * 100
-                        print(f"✅ {category}: {coverage:.1f}% metric coverage - EXCELLENT for internal reporting")
+                if category in summary:
+                    if summary[category][1] > 0:
+                        w(f"✅ {category}: {coverage_pct[category]:.1f}% metric coverage - EXCELLENT for internal reporting\n")
                     else:
-                        print(f"⚠️  {category}: No data available - May need alternative sources")
+                        w(f"⚠️  {category}: No data available - May need alternative sources\n")
                 else:
-                    print(f"❌ {category}: Category not accessible - API limitation")
+                    w(f"❌ {category}: Category not accessible - API limitation\n")
             
-            print(f"\n🎯 CONCLUSION:")
+            w("\n🎯 CONCLUSION:\n")
             if total_data_points > 100:
-                print("✅ FactSet Fundamentals API provides COMPREHENSIVE data coverage for RY-CA")
-                print("✅ Suitable for internal reporting and analysis")
-                print("✅ Recommend proceeding with full implementation")
+                w("✅ FactSet Fundamentals API provides COMPREHENSIVE data coverage for RY-CA\n")
+                w("✅ Suitable for internal reporting and analysis\n")
+                w("✅ Recommend proceeding with full implementation\n")
             elif total_data_points > 50:
-                print("⚠️  FactSet Fundamentals API provides MODERATE data coverage for RY-CA")
-                print("⚠️  May need supplementary data sources for complete reporting")
+                w("⚠️  FactSet Fundamentals API provides MODERATE data coverage for RY-CA\n")
+                w("⚠️  May need supplementary data sources for complete reporting\n")
             else:
-                print("❌ FactSet Fundamentals API provides LIMITED data coverage for RY-CA")
-                print("❌ Consider alternative data sources or investigate access permissions")
+                w("❌ FactSet Fundamentals API provides LIMITED data coverage for RY-CA\n")
+                w("❌ Consider alternative data sources or investigate access permissions\n")
             
-            print("-" * 80)
-            print(f"✅ Test complete at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"🎯 Tested {TEST_TICKER} across {len(TEST_PERIODS)} periods and {len(TEST_CURRENCIES)} currencies")
-            print(f"📊 Evaluated {total_metrics} available metrics across {len(all_metrics)} categories")
+            now = datetime.now()  # Shared by the completion line and the report filename
+            w(SEP + "\n")
+            w(f"✅ Test complete at {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            w(f"🎯 Tested {TEST_TICKER} across {len(TEST_PERIODS)} periods and {len(TEST_CURRENCIES)} currencies\n")
+            w(f"📊 Evaluated {total_metrics} available metrics across {len(all_metrics)} categories\n")
             
-            # Generate HTML report
-            print(f"\n📄 GENERATING HTML REPORT...")
-            html_report = generate_html_report(all_metrics, category_results, TEST_TICKER)
+            sys.stdout.write(report.getvalue())
+            sys.stdout.flush()
             
-            # Save HTML report
+            # Generate HTML report
+            print("\n📄 GENERATING HTML REPORT...")
             output_dir = Path(__file__).parent / "output"
             output_dir.mkdir(exist_ok=True)
             
-            html_filename = f"factset_fundamentals_analysis_{TEST_TICKER}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+            html_filename = f"factset_fundamentals_analysis_{TEST_TICKER}_{now.strftime('%Y%m%d_%H%M%S')}.html"
             html_path = output_dir / html_filename
             
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_report)
+            # Stream the report straight to disk rather than building the whole document in memory.
+            # Written to a temp file and renamed so readers never see a half-written report.
+            tmp_path = html_path.with_suffix('.html.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    write_html_report(f, all_metrics, category_results, TEST_TICKER)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, html_path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
             
             print(f"✅ HTML report saved: {html_path}")
-            print(f"🌐 Open the file in your browser to view the formatted report")
-            print(f"📧 Share the HTML file with your team for review")
+            print("🌐 Open the file in your browser to view the formatted report")
+            print("📧 Share the HTML file with your team for review")
             
     finally:
         # Cleanup
-        if nas_conn:
-            nas_conn.close()
+        try:
+            nas_close.result(timeout=5)
+        except Exception as e:
+            print(f"⚠️  NAS connection did not close cleanly: {e}")
+        io_pool.shutdown(wait=False)
         
-        if temp_cert_path:
+        if temp_cert_path and CLEANUP_SSL_CERT:
             try:
-                os.unlink(temp_cert_path)
-            except:
-                pass
+                Path(temp_cert_path).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"⚠️  Could not remove SSL certificate {temp_cert_path}: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Tests for the Excel formatting helpers in fundamentals_coverage_matrix."""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("fds.sdk.FactSetFundamentals")
+coverage_matrix = pytest.importorskip("fundamentals_coverage_matrix")
+
+
+def test_compute_column_widths_all_na_bank_column():
+    # A bank with no data at all becomes a null[pyarrow] column after convert_dtypes
+    df = pd.DataFrame({
+        'Metric': ['FF_SALES', 'FF_NET_INCOME'],
+        'RY-CA': [None, None],
+        'TD-CA': ['Yes', None],
+    }).convert_dtypes(dtype_backend='pyarrow')
+
+    widths = coverage_matrix.compute_column_widths(df)
+
+    # Empty columns are sized by their header; missing cells don't count
+    assert widths == [len('FF_NET_INCOME') + 2, len('RY-CA') + 2, len('TD-CA') + 2]
+
+
+def test_compute_column_widths_caps_at_max_width():
+    df = pd.DataFrame({'Description': ['x' * 200]})
+
+    assert coverage_matrix.compute_column_widths(df, max_width=50) == [50]